@@ -1,13 +1,66 @@
 import { FastMCP } from 'fastmcp';
-import { exec } from 'child_process';
+import { execFile, spawn } from 'child_process';
+import { accessSync, constants } from 'fs';
+import { delimiter, join } from 'path';
 import { z } from 'zod';
 
-// Helper function to execute shell commands
-function executeCommand(command) {
+// Resolve adb against PATH once at startup so each spawn skips the lookup.
+// Falls back to the bare name, leaving a missing adb to surface as a tool error.
+function resolveAdb() {
+    const name = process.platform === 'win32' ? 'adb.exe' : 'adb';
+    for (const dir of (process.env.PATH ?? '').split(delimiter)) {
+        if (!dir) {
+            continue;
+        }
+        const candidate = join(dir, name);
+        try {
+            accessSync(candidate, constants.X_OK);
+            return candidate;
+        } catch {
+            // Not in this directory; keep looking
+        }
+    }
+    return 'adb';
+}
+
+const ADB = resolveAdb();
+
+// Device commands are sent to, resolved from `adb devices` and reused for
+// DEVICE_TTL_MS, or until adb reports it gone. The `-s <serial>` argv prefix
+// is built once here rather than on every call.
+const DISCONNECT_RE = /device '.*' not found|no devices|device offline/;
+const DEVICE_LINE_RE = /^(\S+)\tdevice\b/m;
+const DEVICE_TTL_MS = 5000;
+let cachedDevice = null;
+
+async function getDefaultDevice() {
+    if (cachedDevice && performance.now() - cachedDevice.resolvedAt < DEVICE_TTL_MS) {
+        return cachedDevice;
+    }
+    const output = await runAdb(['devices']);
+    const match = DEVICE_LINE_RE.exec(output);
+    cachedDevice = match
+        ? { serial: match[1], args: ['-s', match[1]], resolvedAt: performance.now() }
+        : null;
+    return cachedDevice;
+}
+
+// Upper bounds on adb round trips so a wedged device cannot leave a tool call
+// pending for long. Host-side calls such as `adb devices` may have to start
+// the adb server, so they get the generous limit; device actions (svc
+// toggles, input keyevents) finish well inside the short one.
+const ADB_TIMEOUT_MS = 10000;
+const ACTION_TIMEOUT_MS = 2000;
+
+// Helper function to run adb with an argv list (no intermediate /bin/sh)
+function runAdb(args, { timeout = ADB_TIMEOUT_MS } = {}) {
     return new Promise((resolve, reject) => {
-        exec(command, (error, stdout, stderr) => {
+        execFile(ADB, args, { timeout }, (error, stdout, stderr) => {
             if (error) {
                 console.error(`Exec Error: ${error.message}`);
+                if (DISCONNECT_RE.test(error.message)) {
+                    cachedDevice = null;
+                }
                 reject(error);
                 return;
             }
@@ -19,6 +72,176 @@ function executeCommand(command) {
     });
 }
 
+// Persistent `adb shell` session: each tool call only pays for a shell round
+// trip instead of a fresh adb process and transport handshake.
+const SHELL_SENTINEL = '__MCP_END__';
+const SHELL_SENTINEL_RE = new RegExp(`${SHELL_SENTINEL}:(\\d+)\\r?\\n`);
+let shellSession = null;
+let shellQueue = Promise.resolve();
+
+function openShellSession(device) {
+    const child = spawn(ADB, [...device.args, 'shell'], { stdio: ['pipe', 'pipe', 'ignore'] });
+    const session = { child, device, buffer: '', pending: null };
+    child.stdout.setEncoding('utf8');
+    child.stdout.on('data', (chunk) => {
+        session.buffer += chunk;
+        const match = SHELL_SENTINEL_RE.exec(session.buffer);
+        if (!match || !session.pending) {
+            return;
+        }
+        const output = session.buffer.slice(0, match.index);
+        session.buffer = session.buffer.slice(match.index + match[0].length);
+        const { resolve, reject, timer } = session.pending;
+        clearTimeout(timer);
+        session.pending = null;
+        const status = Number(match[1]);
+        if (status === 0) {
+            resolve(output);
+        } else {
+            reject(new Error(`Command exited with status ${status}: ${output.trim()}`));
+        }
+    });
+    const close = () => {
+        if (shellSession === session) {
+            shellSession = null;
+            cachedDevice = null;
+        }
+        if (session.pending) {
+            const error = new Error('adb shell session closed');
+            error.sessionClosed = true;
+            clearTimeout(session.pending.timer);
+            session.pending.reject(error);
+            session.pending = null;
+        }
+    };
+    child.on('error', close);
+    child.on('close', close);
+    child.stdin.on('error', close);
+    return session;
+}
+
+function sendToShell(device, command, timeout) {
+    if (shellSession && shellSession.device.serial !== device.serial) {
+        shellSession.child.kill();
+        shellSession = null;
+    }
+    if (!shellSession) {
+        shellSession = openShellSession(device);
+    }
+    const session = shellSession;
+    return new Promise((resolve, reject) => {
+        // On timeout the session is in an unknown state, so drop it; the
+        // next call opens a fresh one.
+        const timer = setTimeout(() => {
+            session.pending = null;
+            if (shellSession === session) {
+                shellSession = null;
+            }
+            session.child.kill();
+            reject(new Error(`Command timed out after ${timeout} ms`));
+        }, timeout);
+        session.pending = { resolve, reject, timer };
+        session.child.stdin.write(`{ ${command}; } 2>&1; echo ${SHELL_SENTINEL}:$?\n`);
+    });
+}
+
+// Run a device shell command on the persistent session. Calls are queued so
+// output never interleaves; if the session dies we fall back to a one-off
+// `adb shell` process. With no device attached we fail before spawning
+// either.
+function runShell(args, { timeout = ACTION_TIMEOUT_MS } = {}) {
+    const task = async () => {
+        const device = await getDefaultDevice();
+        if (!device) {
+            throw new Error('No Android device connected');
+        }
+        try {
+            return await sendToShell(device, args.join(' '), timeout);
+        } catch (error) {
+            if (error.sessionClosed) {
+                return runAdb([...device.args, 'shell', ...args], { timeout });
+            }
+            throw error;
+        }
+    };
+    const result = shellQueue.then(task, task);
+    shellQueue = result.catch(() => {});
+    return result;
+}
+
+// Run several shell fragments in one round trip. Each fragment is followed
+// by a separator carrying its exit status, so the combined output can be
+// split back into one { status, output } result per fragment.
+const BATCH_SEPARATOR = '__MCP_OP__';
+const BATCH_SEPARATOR_RE = new RegExp(`${BATCH_SEPARATOR}:(\\d+)\\r?\\n`);
+
+async function runShellBatch(fragments) {
+    const script = fragments
+        .map((fragment) => `{ ${fragment}; } 2>&1; echo ${BATCH_SEPARATOR}:$?`)
+        .join(' ; ');
+    const output = await runShell([script], { timeout: ACTION_TIMEOUT_MS * fragments.length });
+    const parts = output.split(BATCH_SEPARATOR_RE);
+    return fragments.map((_, i) => ({
+        status: Number(parts[2 * i + 1]),
+        output: parts[2 * i].trim(),
+    }));
+}
+
+// Map volume and music actions to ADB keyevents (kept as strings so they drop
+// straight into argv without a per-call conversion)
+const VOLUME_KEYEVENTS = {
+    increase: '24',
+    decrease: '25',
+    mute: '164',
+};
+const MUSIC_KEYEVENTS = {
+    play: '126',     // Play resume
+    pause: '127',    // Pause playback
+    next: '87',      // Next song
+    previous: '88',  // Previous song
+    resume: '126',   // Resume playback
+    stop: '86'       // Stop play
+};
+
+// Every action has a fixed argv, so build them all once at import and hand
+// out the same frozen arrays on each call.
+function svcArgs(service) {
+    return {
+        on: Object.freeze(['svc', service, 'enable']),
+        off: Object.freeze(['svc', service, 'disable']),
+    };
+}
+
+function keyeventArgs(keyevents) {
+    return Object.fromEntries(Object.entries(keyevents).map(
+        ([action, keyevent]) => [action, Object.freeze(['input', 'keyevent', keyevent])]));
+}
+
+const WIFI_ARGS = svcArgs('wifi');
+const BLUETOOTH_ARGS = svcArgs('bluetooth');
+const VOLUME_ARGS = keyeventArgs(VOLUME_KEYEVENTS);
+const MUSIC_ARGS = keyeventArgs(MUSIC_KEYEVENTS);
+
+// Shell argv for each controllable action, keyed by batch op name. The single
+// tools and batch_control both dispatch through this table.
+const COMMANDS = {
+    wifi: ({ state }) => WIFI_ARGS[state],
+    bluetooth: ({ state }) => BLUETOOTH_ARGS[state],
+    volume: ({ action }) => VOLUME_ARGS[action],
+    music: ({ action }) => MUSIC_ARGS[action],
+};
+
+// Parameter schemas, declared once and shared by the single tools and the
+// batch_control op union
+const SWITCH_STATE = z.enum(['on', 'off']);
+const VOLUME_ACTION = z.enum(['increase', 'decrease', 'mute']);
+const MUSIC_ACTION = z.enum(['play', 'pause', 'next', 'previous', 'resume', 'stop']);
+const BATCH_OP = z.discriminatedUnion('cmd', [
+    z.object({ cmd: z.literal('wifi'), state: SWITCH_STATE }),
+    z.object({ cmd: z.literal('bluetooth'), state: SWITCH_STATE }),
+    z.object({ cmd: z.literal('volume'), action: VOLUME_ACTION }),
+    z.object({ cmd: z.literal('music'), action: MUSIC_ACTION }),
+]);
 
 // 1. Create the server
 const server = new FastMCP({
@@ -27,24 +250,31 @@ const server = new FastMCP({
 });
 
 // 2. Add your tools
+// Register a tool that runs one COMMANDS entry on the device and replies
+// with `message(params)` on success.
+function addActionTool({ command, message, ...tool }) {
+    server.addTool({
+        ...tool,
+        execute: async (params) => {
+            try {
+                await runShell(COMMANDS[command](params));
+                return message(params);
+            } catch (error) {
+                return `ADB command failed: ${error.message}`;
+            }
+        },
+    });
+}
+
 //wifi_control
-server.addTool({
+addActionTool({
     name: 'wifi_control',
     description: 'Turns the WiFi on or off on a connected Android device using ADB.',
     parameters: z.object({
-        state: z.enum(['on', 'off']).describe("The desired WiFi state. Can be 'on' or 'off'."),
+        state: SWITCH_STATE.describe("The desired WiFi state. Can be 'on' or 'off'."),
     }),
-    execute: async ({ state }) => {
-        const adbCommand = state === 'on'
-            ? 'adb shell svc wifi enable'
-            : 'adb shell svc wifi disable';
-        try {
-            await executeCommand(adbCommand);
-            return `Successfully turned WiFi ${state}.`;
-        } catch (error) {
-            return `ADB command failed: ${error.message}`;
-        }
-    },
+    command: 'wifi',
+    message: ({ state }) => `Successfully turned WiFi ${state}.`,
 });
 
 //device list
@@ -53,9 +283,8 @@ server.addTool({
     description: 'Lists all connected Android devices using ADB.',
     parameters: z.object({}),
     execute: async () => {
-        const adbCommand = 'adb devices';
         try {
-            const output = await executeCommand(adbCommand);
+            const output = await runAdb(['devices']);
             return `Connected devices:\n${output}`;
         } catch (error) {
             return `ADB command failed: ${error.message}`;
@@ -66,77 +295,54 @@ server.addTool({
 
 
 // Bluetooth Control
-server.addTool({
+addActionTool({
     name: 'bt_control',
     description: 'Turns the Bluetooth on or off on a connected Android device using ADB.',
     parameters: z.object({
-        state: z.enum(['on', 'off']).describe("The desired Bluetooth state. Can be 'on' or 'off'."),
+        state: SWITCH_STATE.describe("The desired Bluetooth state. Can be 'on' or 'off'."),
     }),
-    execute: async ({ state }) => {
-        const adbCommand = state === 'on'
-            ? 'adb shell svc bluetooth enable'
-            : 'adb shell svc bluetooth disable';
-        try {
-            await executeCommand(adbCommand);
-            return `Successfully turned Bluetooth ${state}.`;
-        } catch (error) {
-            return `ADB command failed: ${error.message}`;
-        }
-    },
+    command: 'bluetooth',
+    message: ({ state }) => `Successfully turned Bluetooth ${state}.`,
 });
 // Volume Control
-server.addTool({
+addActionTool({
     name: 'volume_control',
     description: 'Controls the volume on a connected Android device using ADB.',
     parameters: z.object({
-        action: z.enum(['increase', 'decrease', 'mute']).describe("The volume action to perform."),
+        action: VOLUME_ACTION.describe("The volume action to perform."),
     }),
-    execute: async ({ action }) => {
-        // Map actions to ADB keyevents
-        const keyeventMap = {
-            increase: 24,     
-            decrease: 25,    
-            mute: 164,
-        };
-        const keyevent = keyeventMap[action];
-        if (!keyevent) {f
-            return `Unsupported action: ${action}`;
-        }
-        const adbCommand = `adb shell input keyevent ${keyevent}`;
-        try {
-            await executeCommand(adbCommand);
-            return `Successfully performed ${action} action on music playback.`;
-        } catch (error) {
-            return `ADB command failed: ${error.message}`;
-        }
-    },
+    command: 'volume',
+    message: ({ action }) => `Successfully performed ${action} action on music playback.`,
 });
                 
 // Music Control
-server.addTool({
+addActionTool({
     name: 'music_control',
     description: 'Controls music playback on a connected Android device using ADB keyevents.',
     parameters: z.object({
-        action: z.enum(['play', 'pause', 'next', 'previous', 'resume', 'stop']).describe("The music playback action to perform."),
+        action: MUSIC_ACTION.describe("The music playback action to perform."),
     }),
-    execute: async ({ action }) => {
-        // Map actions to ADB keyevents
-        const keyeventMap = {
-            play: 126,     // Play resume
-            pause: 127,    // Pause playback
-            next: 87,      // Next song
-            previous: 88,  // Previous song
-            resume: 126,   // Resume playback
-            stop: 86       // Stop play
-        };
-        const keyevent = keyeventMap[action];
-        if (!keyevent) {f
-            return `Unsupported action: ${action}`;
-        }
-        const adbCommand = `adb shell input keyevent ${keyevent}`;
+    command: 'music',
+    message: ({ action }) => `Successfully performed ${action} action on music playback.`,
+});
+
+// Batch Control
+server.addTool({
+    name: 'batch_control',
+    description: 'Runs several control actions in order using a single ADB shell round trip.',
+    parameters: z.object({
+        ops: z.array(BATCH_OP).min(1).describe("Actions to perform. They run one after another on the device, not in parallel."),
+    }),
+    execute: async ({ ops }) => {
+        const fragments = ops.map((op) => COMMANDS[op.cmd](op).join(' '));
         try {
-            await executeCommand(adbCommand);
-            return `Successfully performed ${action} action on music playback.`;
+            const results = await runShellBatch(fragments);
+            return results.map(({ status, output }, i) => {
+                const label = `${ops[i].cmd} ${ops[i].state ?? ops[i].action}`;
+                return status === 0
+                    ? `${label}: ok`
+                    : `${label}: failed with status ${status}${output ? `: ${output}` : ''}`;
+            }).join('\n');
         } catch (error) {
             return `ADB command failed: ${error.message}`;
         }